@@ -1,152 +1,219 @@
 import pandas as pd
 import numpy as np
 import datetime as dt
-import time
 import requests
-from sodapy import Socrata
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 
+SOCRATA_URL = "https://data.cityofnewyork.us/resource/erm2-nwe9.json"
+
+# Columns to be taken
+SUBFIELDS = [
+    "unique_key",
+    "created_date",
+    "closed_date",
+    "agency",
+    "agency_name",
+    "complaint_type",
+    "descriptor",
+    "location_type",
+    "status",
+    "community_board",
+    "borough",
+    "open_data_channel_type",
+    "park_facility_name",
+    "park_borough",
+    "incident_zip",
+    "incident_address",
+    "street_name",
+    "cross_street_1",
+    "cross_street_2",
+    "intersection_street_1",
+    "intersection_street_2",
+    "city",
+    "landmark",
+    "bbl",
+    "x_coordinate_state_plane",
+    "y_coordinate_state_plane",
+    "latitude",
+    "longitude",
+    "location",
+    "resolution_description",
+    "resolution_action_updated_date",
+]
+
+# Low-cardinality columns, stored as categoricals (codes + small dictionary)
+CATEGORY_SUBFIELDS = [
+    "agency",
+    "agency_name",
+    "borough",
+    "status",
+    "open_data_channel_type",
+    "community_board",
+    "complaint_type",
+    "descriptor",
+    "location_type",
+    "park_borough",
+    "city",
+]
+
+# Columns the API returns as text but that hold numbers
+NUMERIC_SUBFIELDS = [
+    "unique_key",
+    "x_coordinate_state_plane",
+    "y_coordinate_state_plane",
+    "latitude",
+    "longitude",
+]
+
+
+def make_session(app_token: str | None = None) -> requests.Session:
+    """Creates a keep-alive HTTP session for the Socrata API.
+    Throttled (429) and failed requests are retried, honouring the Retry-After header.
 
-def get_311_data(
-    limit: int = 2000,
-    app_token: str | None = None,
+    Args:
+        app_token (str | None, optional): Socrata App Token from NYC OpenData. Defaults to None.
+
+    Returns:
+        requests.Session: Session with retrying keep-alive connections.
+    """
+    retries = Retry(
+        total=5,
+        backoff_factor=3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retries)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    if app_token:
+        session.headers["X-App-Token"] = app_token
+
+    return session
+
+
+def get_311_records(
+    limit: int = 50000,
     date_max: str = "2026-01-01T00:00:00",
-) -> pd.DataFrame:
-    """Collects 311 service request data and returns a data frame
-    NOTE: 25 sweeps of `limit` rows will be performed.
+    max_rows: int = 600000,
+    session: requests.Session | None = None,
+) -> list[dict]:
+    """Collects raw 311 service request records as returned by the API
+    Pages are walked backwards in time using the last (`created_date`, `unique_key`) seen as a cursor.
 
     Args:
-        limit (int, optional): Collects `limit` x 25 rows of data. Defaults to 2000 (MAX).
-        app_token (str|None, optional): Socrata App Token from NYC OpenData. Data colection is faster if provided. Defaults to None.
+        limit (int, optional): Rows requested per page. Defaults to 50000.
         date_max (str, optional): Most recent date you want to collect from in the form 'YYYY-MM-DDTHH:MM:SS'. Defaults to Jan 1 2026, 00:00:00.
+        max_rows (int, optional): Stop once this many rows have been collected. Defaults to 600000.
+        session (requests.Session | None, optional): Session to reuse across calls. A new one is created if not provided. Defaults to None.
 
     Returns:
-        pd.DataFrame: DataFrame object containing all the fetched data.
+        list[dict]: All fetched records, most recent first.
     """
 
-    # Columns to be taken
-    SUBFIELDS = [
-        "unique_key",
-        "created_date",
-        "closed_date",
-        "agency",
-        "agency_name",
-        "complaint_type",
-        "descriptor",
-        "location_type",
-        "status",
-        "community_board",
-        "borough",
-        "open_data_channel_type",
-        "park_facility_name",
-        "park_borough",
-        "incident_zip",
-        "incident_address",
-        "street_name",
-        "cross_street_1",
-        "cross_street_2",
-        "intersection_street_1",
-        "intersection_street_2",
-        "city",
-        "landmark",
-        "bbl",
-        "x_coordinate_state_plane",
-        "y_coordinate_state_plane",
-        "latitude",
-        "longitude",
-        "location",
-        "resolution_description",
-        "resolution_action_updated_date",
-    ]
+    if session is None:
+        print("Establishing Source...")
+        session = make_session()
+
+    def fetch_page(where: str) -> list[dict]:
+        response = session.get(
+            SOCRATA_URL,
+            params={
+                "$limit": limit,
+                # Take only NYPD agencies with closed requests, past the cursor
+                "$where": f"agency = 'NYPD' and status = 'Closed' and {where}",
+                # unique_key breaks ties so the cursor is unique even within a second
+                "$order": "created_date desc, unique_key desc",
+            },
+            timeout=300,
+        )
+        response.raise_for_status()
 
-    print("Establishing Source...")
-    client = Socrata("data.cityofnewyork.us", app_token, timeout=300)
+        return response.json()
 
-    data = []
     print("Obtaining Data...")
-    for offs in range(0, 48001, 2000):
-        # For 25 sweeps, `limit` rows are collected. Each sweep is seperated by an offset of 2000.
-        print(f"\r{offs}", end="")
-
-        results = client.get(
-            "erm2-nwe9",
-            limit=limit,
-            offset=offs,
-            # Take only NYPD agencies with closed requests, before `data_max`
-            where=f"agency = 'NYPD' and status = 'Closed' and created_date < '{date_max}'",
-            order="created_date desc",
+    records = []
+    where = f"created_date < '{date_max}'"
+
+    while len(records) < max_rows:
+        page = fetch_page(where)
+        records.extend(page)
+        print(f"\r{len(records)}", end="")
+
+        if len(page) < limit:
+            break
+
+        # Resume strictly after the last (created_date, unique_key) of the page
+        created, key = page[-1]["created_date"], page[-1]["unique_key"]
+        where = (
+            f"(created_date < '{created}'"
+            f" or (created_date = '{created}' and unique_key < '{key}'))"
         )
-
-        results_df = pd.DataFrame.from_records(results, columns=SUBFIELDS)
-
-        data.append(results_df)
-        time.sleep(3)
     print()
 
-    full = pd.concat(data)
-    full.reset_index(inplace=True)
+    if len(records) < max_rows:
+        print(f"Source exhausted after {len(records)} of {max_rows} requested rows.")
 
-    # Basic feature engineering
-    full["created_date"] = pd.to_datetime(full["created_date"])
-    full["closed_date"] = pd.to_datetime(full["closed_date"])
+    return records[:max_rows]
 
-    return full
 
-
-def get_earliest_date(df: pd.DataFrame) -> str:
-    """Utility function to obtain earliest date in the request dataframe
+def records_to_frame(records: list[dict]) -> pd.DataFrame:
+    """Builds the service request DataFrame from raw API records in a single pass
 
     Args:
-        df (pd.DataFrame): Service requests DataFrame object
+        records (list[dict]): Records as returned by get_311_records.
 
     Returns:
-        str: Earliest data in 'YYYY-MM-DDTHH:MM:SS' format
+        pd.DataFrame: DataFrame object restricted to SUBFIELDS, with parsed dates, numbers and categoricals.
     """
-    return str(df["created_date"].min()).replace(" ", "T")
+    full = pd.DataFrame.from_records(records, columns=SUBFIELDS)
+    full[NUMERIC_SUBFIELDS] = full[NUMERIC_SUBFIELDS].apply(pd.to_numeric)
+    full = full.astype({col: "category" for col in CATEGORY_SUBFIELDS})
+
+    # Basic feature engineering
+    full["created_date"] = pd.to_datetime(full["created_date"])
+    full["closed_date"] = pd.to_datetime(full["closed_date"])
+
+    return full
 
 
 def get_all_data(
-    limit: int = 2000,
+    limit: int = 50000,
     app_token: str | None = None,
     date_max: str = "2026-01-01T00:00:00",
+    max_rows: int = 600000,
 ) -> pd.DataFrame:
-    """Performs 12 iterations of get_311_data(*args) with the specified parameters and returns the combined DataFrame object.
+    """Collects up to `max_rows` service requests before `date_max` and returns them as a DataFrame object.
 
     Args:
-        limit (int, optional): Collects `limit` x 25 x 12 rows of data. Defaults to 2000 (MAX).
+        limit (int, optional): Rows requested per page. Defaults to 50000.
         app_token (str | None, optional): Socrata App Token from NYC OpenData. Data colection is faster if provided. Defaults to None.
         date_max (str, optional): Most recent date you want to collect from in the form 'YYYY-MM-DDTHH:MM:SS'. Defaults to "2026-01-01T00:00:00".
+        max_rows (int, optional): Maximum number of rows to collect. Defaults to 600000.
 
     Returns:
         pd.DataFrame: Consolidated DataFrame object with the service request data.
     """
 
-    print("Iteration: 1/12")
-    dfs = []
-
-    df1 = get_311_data(limit, app_token=app_token, date_max=date_max)
-    df_last = get_earliest_date(df1)
-    dfs.append(df1)
-
-    for _ in range(2, 13):
-        print()
-        print(f"Iteration: {_}/12")
-        df = get_311_data(limit=limit, app_token=app_token, date_max=df_last)
-        df_last = get_earliest_date(df)
-        dfs.append(df)
+    print("Establishing Source...")
+    session = make_session(app_token)
 
-    full_data = pd.concat(dfs, ignore_index=True)
+    records = get_311_records(
+        limit, date_max=date_max, max_rows=max_rows, session=session
+    )
+    full_data = records_to_frame(records)
 
     return full_data
 
 
 if __name__ == "__main__":
     ENV = pd.read_json("env.json", typ="series")
-    df = get_all_data(2000, app_token=ENV["APP_TOKEN"], date_max="2026-01-01T00:00:00")
-    df.drop(columns="index", inplace=True)
+    df = get_all_data(app_token=ENV["APP_TOKEN"], date_max="2026-01-01T00:00:00")
     print(f"{len(df)} Rows")
     print(f"{len(df.columns)} Columns")
     print()
@@ -165,7 +232,7 @@ if __name__ == "__main__":
 
     os.makedirs(data_dir, exist_ok=True)
 
-    output_path = os.path.join(data_dir, "requests.csv")
-    df.to_csv(output_path, index=False)
+    output_path = os.path.join(data_dir, "requests.parquet")
+    df.to_parquet(output_path, engine="pyarrow", compression="zstd", index=False)
 
     print("Saved to:", output_path)
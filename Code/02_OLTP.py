@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import os
 import sqlite3 as sq3
@@ -11,6 +12,128 @@ OLTP_SCHEMA_TABLES = [
     "service_request",
 ]
 
+# Low-cardinality text columns of requests.parquet, loaded as categoricals
+REQUESTS_DTYPES = {
+    "agency": "category",
+    "agency_name": "category",
+    "borough": "category",
+    "status": "category",
+    "open_data_channel_type": "category",
+    "city": "category",
+    "community_board": "category",
+    "complaint_type": "category",
+    "descriptor": "category",
+    "location_type": "category",
+    "park_borough": "category",
+}
+
+# Columns of requests that together identify a row of the location table
+LOCATION_COLS = [
+    "borough",
+    "community_board",
+    "incident_zip",
+    "city",
+    "latitude",
+    "longitude",
+    "x_coordinate_state_plane",
+    "y_coordinate_state_plane",
+    "location_type",
+    "incident_address",
+    "street_name",
+    "cross_street_1",
+    "cross_street_2",
+    "intersection_street_1",
+    "intersection_street_2",
+    "landmark",
+    "bbl",
+]
+
+# Columns of requests.parquet used by the OLTP tables; the raw location point is skipped
+REQUESTS_COLS = [
+    "unique_key",
+    "created_date",
+    "closed_date",
+    "resolution_action_updated_date",
+    "status",
+    "open_data_channel_type",
+    "resolution_description",
+    "agency",
+    "agency_name",
+    "complaint_type",
+    "descriptor",
+    "park_facility_name",
+    "park_borough",
+] + LOCATION_COLS
+
+# Statements are kept verbatim so sqlite3 reuses its cached prepared statements
+INSERT_AGENCY_SQL = """
+INSERT OR IGNORE INTO agency (agency_id, agency_code, agency_name)
+VALUES (?, ?, ?);
+"""
+
+INSERT_BOROUGH_SQL = """
+INSERT OR IGNORE INTO borough (borough_id, borough_name)
+VALUES (?, ?);
+"""
+
+INSERT_COMPLAINT_SQL = """
+INSERT OR IGNORE INTO complaint (complaint_id, complaint_type, descriptor)
+VALUES (?, ?, ?);
+"""
+
+INSERT_PARK_SQL = """
+INSERT OR IGNORE INTO park (park_id, park_facility_name, park_borough)
+VALUES (?, ?, ?);
+"""
+
+INSERT_LOCATION_SQL = """
+INSERT OR IGNORE INTO location (
+    location_id, borough_id, board_id, zip, city, latitude, longitude,
+    x_coordinate_state_plane, y_coordinate_state_plane, location_type,
+    incident_address, street_name, cross_street_1, cross_street_2,
+    intersection_street_1, intersection_street_2,
+    landmark, bbl
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+# Stored locations with their columns named as in LOCATION_COLS
+SELECT_LOCATION_SQL = """
+SELECT
+    l.location_id, b.borough_name AS borough, l.board_id AS community_board,
+    l.zip AS incident_zip, l.city, l.latitude, l.longitude,
+    l.x_coordinate_state_plane, l.y_coordinate_state_plane, l.location_type,
+    l.incident_address, l.street_name, l.cross_street_1, l.cross_street_2,
+    l.intersection_street_1, l.intersection_street_2, l.landmark, l.bbl
+FROM location l
+LEFT JOIN borough b ON l.borough_id = b.borough_id;
+"""
+
+INSERT_SERVICE_REQUEST_SQL = """
+INSERT OR IGNORE INTO service_request (
+    request_id, created_timestamp, closed_timestamp,
+    resolution_action_updated_timestamp, status, channel,
+    agency_id, complaint_id, location_id, park_id, resolution_description
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+
+def tune(conn: sq3.Connection):
+    """Connection settings for fast bulk writes: WAL journal, no fsync per commit,
+    in-memory temp storage and a larger page cache / mmap window.
+    """
+    conn.executescript(
+        """
+        PRAGMA journal_mode = WAL;
+        PRAGMA synchronous = NORMAL;
+        PRAGMA temp_store = MEMORY;
+        PRAGMA cache_size = -262144;
+        PRAGMA mmap_size = 268435456;
+        PRAGMA foreign_keys = ON;
+        """
+    )
+
 
 def create_schema(conn: sq3.Connection):
     cur = conn.cursor()
@@ -85,24 +208,17 @@ def create_schema(conn: sq3.Connection):
     conn.commit()
 
 
-def check_table(conn: sq3.Connection, table_name: str):
-    cur = conn.cursor()
-    cur.execute(
-        f"""
-    SELECT name
-    FROM sqlite_master
-    WHERE type='table' AND name='{table_name}';
-    """
-    )
-
-    exists = cur.fetchone() is not None
-    return exists
+def existing_tables(conn: sq3.Connection) -> set[str]:
+    cur = conn.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    return {row[0] for row in cur.fetchall()}
 
 
 def check_schema(conn: sq3.Connection):
+    existing = existing_tables(conn)
+
     flag = True
     for table in OLTP_SCHEMA_TABLES:
-        exists = check_table(conn, table)
+        exists = table in existing
         print(f"{table} {'exists.' if exists else 'does not exist.'}")
         if not exists:
             print(
@@ -117,15 +233,30 @@ def check_schema(conn: sq3.Connection):
 
 
 def clear_tables(conn: sq3.Connection):
-    cur = conn.cursor()
-    cur.execute("PRAGMA foreign_keys = OFF;")
+    # FK pragma is ignored inside a transaction, so toggle it around the DELETEs
+    conn.execute("PRAGMA foreign_keys = OFF;")
+    with conn:
+        for table in OLTP_SCHEMA_TABLES:
+            conn.execute(f"DELETE FROM {table};")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    print("\x1b[32mAll tables cleared.\x1b[0m")
 
-    for table in OLTP_SCHEMA_TABLES:
-        cur.execute(f"DELETE FROM {table};")
 
-    cur.execute("PRAGMA foreign_keys = ON;")
-    conn.commit()
-    print("\x1b[32mAll tables cleared.\x1b[0m")
+def enable_bulk_mode(conn: sq3.Connection):
+    """Skip foreign key checks while the tables are bulk loaded.
+    They are enforced again once disable_bulk_mode is called.
+    """
+    conn.execute("PRAGMA foreign_keys = OFF;")
+
+
+def disable_bulk_mode(conn: sq3.Connection):
+    """Re-enable foreign key checks and refresh planner statistics after a bulk load."""
+    conn.executescript(
+        """
+        PRAGMA foreign_keys = ON;
+        PRAGMA optimize;
+        """
+    )
 
 
 def add_agency(conn: sq3.Connection, df: pd.DataFrame) -> None:
@@ -137,17 +268,16 @@ def add_agency(conn: sq3.Connection, df: pd.DataFrame) -> None:
     );
     """
     cur = conn.cursor()
-    for agency_id, agency in enumerate(df["agency"].unique()):
-        agency_name = df["agency_name"][df["agency"] == agency].iloc[0]
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO agency (agency_id, agency_code, agency_name)
-            VALUES (?, ?, ?);
-            """,
-            (agency_id, agency, agency_name),
+    # First agency_name seen for each agency code
+    agencies = df[["agency", "agency_name"]].drop_duplicates(subset="agency")
+    rows = [
+        (agency_id, *agency)
+        for agency_id, agency in enumerate(
+            agencies.itertuples(index=False, name=None)
         )
+    ]
 
-    conn.commit()
+    cur.executemany(INSERT_AGENCY_SQL, rows)
 
 
 def add_borough(conn: sq3.Connection, df: pd.DataFrame) -> None:
@@ -158,16 +288,14 @@ def add_borough(conn: sq3.Connection, df: pd.DataFrame) -> None:
     );
     """
     cur = conn.cursor()
-    for borough_id, borough in enumerate(df["borough"].unique()):
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO borough (borough_id, borough_name)
-            VALUES (?, ?);
-            """,
-            (borough_id, borough),
-        )
+    stored = {name for (name,) in cur.execute("SELECT borough_name FROM borough;")}
+    boroughs = [name for name in df["borough"].unique().tolist() if name not in stored]
 
-    conn.commit()
+    # Keep the ids of stored boroughs and number only the new ones after them
+    next_id = cur.execute("SELECT COALESCE(MAX(borough_id), -1) + 1 FROM borough;")
+    rows = list(enumerate(boroughs, start=next_id.fetchone()[0]))
+
+    cur.executemany(INSERT_BOROUGH_SQL, rows)
 
 
 def add_complaint_type(conn: sq3.Connection, df: pd.DataFrame) -> None:
@@ -180,18 +308,14 @@ def add_complaint_type(conn: sq3.Connection, df: pd.DataFrame) -> None:
     """
     cur = conn.cursor()
     complaint_types = df[["complaint_type", "descriptor"]].drop_duplicates()
-    complaint_id = 0
-    for _, row in complaint_types.iterrows():
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO complaint (complaint_id, complaint_type, descriptor)
-            VALUES (?, ?, ?);
-            """,
-            (complaint_id, row["complaint_type"], row["descriptor"]),
+    rows = [
+        (complaint_id, *complaint)
+        for complaint_id, complaint in enumerate(
+            complaint_types.itertuples(index=False, name=None)
         )
-        complaint_id += 1
+    ]
 
-    conn.commit()
+    cur.executemany(INSERT_COMPLAINT_SQL, rows)
 
 
 def add_park(conn: sq3.Connection, df: pd.DataFrame) -> None:
@@ -204,18 +328,33 @@ def add_park(conn: sq3.Connection, df: pd.DataFrame) -> None:
     """
     cur = conn.cursor()
     parks = df[["park_facility_name", "park_borough"]].drop_duplicates()
-    park_id = 0
-    for _, row in parks.iterrows():
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO park (park_id, park_facility_name, park_borough)
-            VALUES (?, ?, ?);
-            """,
-            (park_id, row["park_facility_name"], row["park_borough"]),
-        )
-        park_id += 1
-
-    conn.commit()
+    rows = [
+        (park_id, *park)
+        for park_id, park in enumerate(parks.itertuples(index=False, name=None))
+    ]
+
+    cur.executemany(INSERT_PARK_SQL, rows)
+
+
+def lookup(
+    conn: sq3.Connection, query: str, frame: pd.DataFrame, keys: list[str]
+) -> pd.DataFrame:
+    """Left-joins `frame` to a table's ids on the columns that identify its rows."""
+    # Compare plain values: a categorical cast would turn unseen stored values into NaN
+    as_values = {key: object for key in keys}
+    table = pd.read_sql_query(query, conn).astype(as_values)
+    table = table.drop_duplicates(subset=keys, keep="last")
+    return frame.astype(as_values).merge(table, on=keys, how="left")
+
+
+def build_locations(df: pd.DataFrame) -> pd.DataFrame:
+    """Distinct locations of the requests, in LOCATION_COLS terms."""
+    # Extract board_id from "<board_id> <borough>" format
+    return (
+        df[LOCATION_COLS]
+        .assign(community_board=df["community_board"].str.split().str[0])
+        .drop_duplicates()
+    )
 
 
 def add_location(conn: sq3.Connection, df: pd.DataFrame) -> None:
@@ -243,73 +382,25 @@ def add_location(conn: sq3.Connection, df: pd.DataFrame) -> None:
     );
     """
     cur = conn.cursor()
-    locations = df[
-        [
-            "borough",
-            "community_board",
-            "incident_zip",
-            "city",
-            "latitude",
-            "longitude",
-            "x_coordinate_state_plane",
-            "y_coordinate_state_plane",
-            "location_type",
-            "incident_address",
-            "street_name",
-            "cross_street_1",
-            "cross_street_2",
-            "intersection_street_1",
-            "intersection_street_2",
-            "landmark",
-            "bbl",
-        ]
-    ].drop_duplicates()
-
-    borough_map = {}
-    cur.execute("SELECT borough_id, borough_name FROM borough;")
-    rows = cur.fetchall()
-    for row in rows:
-        borough_map[row[1]] = row[0]
-
-    location_id = 0
-    for _, row in locations.iterrows():
-        borough_id = borough_map.get(row["borough"], None)
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO location (
-                location_id, borough_id, board_id, zip, city, latitude, longitude,
-                x_coordinate_state_plane, y_coordinate_state_plane, location_type,
-                incident_address, street_name, cross_street_1, cross_street_2,
-                intersection_street_1, intersection_street_2,
-                landmark, bbl
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-            """,
-            (
-                location_id,
-                borough_id,
-                # Extract board_id from "<board_id> <borough>" format
-                row["community_board"].split()[0],
-                row["incident_zip"],
-                row["city"],
-                row["latitude"],
-                row["longitude"],
-                row["x_coordinate_state_plane"],
-                row["y_coordinate_state_plane"],
-                row["location_type"],
-                row["incident_address"],
-                row["street_name"],
-                row["cross_street_1"],
-                row["cross_street_2"],
-                row["intersection_street_1"],
-                row["intersection_street_2"],
-                row["landmark"],
-                row["bbl"],
-            ),
+    locations = build_locations(df)
+
+    # Keep the ids of stored locations and number only the new ones after them
+    locations = lookup(conn, SELECT_LOCATION_SQL, locations, LOCATION_COLS)
+    locations = locations[locations["location_id"].isna()].drop(columns="location_id")
+    next_id = cur.execute("SELECT COALESCE(MAX(location_id), -1) + 1 FROM location;")
+    start = next_id.fetchone()[0]
+    locations.insert(0, "location_id", np.arange(start, start + len(locations)))
+
+    borough_map = dict(cur.execute("SELECT borough_name, borough_id FROM borough;"))
+
+    rows = [
+        (location_id, borough_map.get(borough, None), *location)
+        for location_id, borough, *location in locations.itertuples(
+            index=False, name=None
         )
-        location_id += 1
+    ]
 
-    conn.commit()
+    cur.executemany(INSERT_LOCATION_SQL, rows)
 
 
 def add_service_request(conn: sq3.Connection, df: pd.DataFrame) -> None:
@@ -334,126 +425,54 @@ def add_service_request(conn: sq3.Connection, df: pd.DataFrame) -> None:
     """
     cur = conn.cursor()
 
-    agency_map = {}
-    cur.execute("SELECT agency_id, agency_code FROM agency;")
-    rows = cur.fetchall()
-    for row in rows:
-        agency_map[row[1]] = row[0]
-
-    complaint_map = {}
-    cur.execute("SELECT complaint_id, complaint_type FROM complaint;")
-    rows = cur.fetchall()
-    for row in rows:
-        complaint_map[row[1]] = row[0]
-
-    park_map = {}
-    cur.execute("SELECT park_id, park_facility_name FROM park;")
-    rows = cur.fetchall()
-    for row in rows:
-        park_map[row[1]] = row[0]
-
-    location_map = {}
-
-    cur.execute(
-        """
-    SELECT
-    location_id,
-    borough_id,
-    board_id,
-    zip,
-    city,
-    latitude,
-    longitude,
-    x_coordinate_state_plane,
-    y_coordinate_state_plane,
-    incident_address,
-    street_name,
-    cross_street_1,
-    cross_street_2,
-    intersection_street_1,
-    intersection_street_2,
-    landmark,
-    bbl
-    FROM location;
-    """
+    requests = df.rename_axis("request_id").reset_index()
+    # Store timestamps as text, leaving missing ones as NULL rather than "NaT"
+    for col in ["created_date", "closed_date"]:
+        requests[col] = requests[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+    requests["community_board"] = requests["community_board"].str.split().str[0]
+
+    requests = lookup(
+        conn,
+        "SELECT agency_id, agency_code AS agency FROM agency;",
+        requests,
+        ["agency"],
     )
+    requests = lookup(
+        conn,
+        "SELECT complaint_id, complaint_type, descriptor FROM complaint;",
+        requests,
+        ["complaint_type", "descriptor"],
+    )
+    requests = lookup(
+        conn,
+        "SELECT park_id, park_facility_name, park_borough FROM park;",
+        requests,
+        ["park_facility_name", "park_borough"],
+    )
+    requests = lookup(conn, SELECT_LOCATION_SQL, requests, LOCATION_COLS)
 
-    def norm(x):
-        return None if pd.isna(x) else str(x)
-
-    for row in cur.fetchall():
-        location_map[tuple(list(map(norm, row[1:])))] = row[0]
-
-    borough_map = {}
-    cur.execute("SELECT borough_id, borough_name FROM borough;")
-    rows = cur.fetchall()
-    for row in rows:
-        borough_map[row[1]] = row[0]
-
-    flag = False
-    for request_id, row in df.iterrows():
-        agency_id = agency_map.get(row["agency"], None)
-        complaint_id = complaint_map.get(row["complaint_type"], None)
-        park_id = park_map.get(row["park_facility_name"], None)
-        location_key = (
-            norm(borough_map.get(row["borough"])),
-            (
-                row["community_board"].split()[0]
-                if pd.notna(row["community_board"])
-                else None
-            ),
-            norm(row["incident_zip"]),
-            norm(row["city"]),
-            norm(row["latitude"]),
-            norm(row["longitude"]),
-            norm(row["x_coordinate_state_plane"]),
-            norm(row["y_coordinate_state_plane"]),
-            norm(row["incident_address"]),
-            norm(row["street_name"]),
-            norm(row["cross_street_1"]),
-            norm(row["cross_street_2"]),
-            norm(row["intersection_street_1"]),
-            norm(row["intersection_street_2"]),
-            norm(row["landmark"]),
-            norm(row["bbl"]),
-        )
-
-        location_id = location_map.get(location_key)
-        if location_id == None and not flag:
-            print("ERROR: Location not found for request_id:", request_id)
-            print("key:", location_key)
-            print("sample keys from location_map:", list(location_map.keys())[:5])
-            flag = True
-            # quit(1)
-            # break
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO service_request (
-                request_id, created_timestamp, closed_timestamp,
-                resolution_action_updated_timestamp, status, channel,
-                agency_id, complaint_id, location_id, park_id, resolution_description
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-            """,
-            (
-                request_id,
-                row["created_date"],
-                row["closed_date"],
-                row["resolution_action_updated_date"],
-                row["status"],
-                row["open_data_channel_type"],
-                agency_id,
-                complaint_id,
-                location_id,
-                park_id,
-                row["resolution_description"],
-            ),
-        )
+    rows = requests[
+        [
+            "request_id",
+            "created_date",
+            "closed_date",
+            "resolution_action_updated_date",
+            "status",
+            "open_data_channel_type",
+            "agency_id",
+            "complaint_id",
+            "location_id",
+            "park_id",
+            "resolution_description",
+        ]
+    ].itertuples(index=False, name=None)
 
-    conn.commit()
+    cur.executemany(INSERT_SERVICE_REQUEST_SQL, rows)
 
 
 def add_contents(conn: sq3.Connection, df: pd.DataFrame):
+    # All tables are loaded in a single transaction and committed once
+    conn.execute("BEGIN;")
     for table in OLTP_SCHEMA_TABLES:
         print(f"Adding contents to {table}...")
         match table:
@@ -469,6 +488,7 @@ def add_contents(conn: sq3.Connection, df: pd.DataFrame):
                 add_location(conn, df)
             case "service_request":
                 add_service_request(conn, df)
+    conn.commit()
 
     print("\x1b[32mSUCCESS: All contents added to database.\x1b[0m")
 
@@ -478,6 +498,7 @@ if __name__ == "__main__":
     db_dir = os.path.join(base_dir, "Data")
     db_path = os.path.join(db_dir, "oltp_311.db")
     conn = sq3.connect(db_path)
+    tune(conn)
 
     print("Connection to oltp_311.db established.")
 
@@ -504,8 +525,12 @@ if __name__ == "__main__":
         quit(0)
 
     print("Reading the data...")
-    data_path = os.path.join(db_dir, "requests.csv")
-    df = pd.read_csv(data_path, index_col="unique_key")
+    data_path = os.path.join(db_dir, "requests.parquet")
+    df = pd.read_parquet(data_path, engine="pyarrow", columns=REQUESTS_COLS)
+    df = df.set_index("unique_key")
+    df = df.astype(REQUESTS_DTYPES)
 
     print("Adding dataframe contents to database...\n")
+    enable_bulk_mode(conn)
     add_contents(conn, df)
+    disable_bulk_mode(conn)
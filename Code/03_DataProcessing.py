@@ -2,139 +2,178 @@ import numpy as np
 import pandas as pd
 import sqlite3 as sq3
 import os
+import re
 
 YELLOW = "\x1b[33m"
 GREEN = "\x1b[32m"
 RED = "\x1b[31m"
 RESET = "\x1b[0m"
 
-
-def conv_to_days(waittime: pd.Timedelta) -> float | None:  # must be a timedelta type
-    """Convert wait times to days
-
-    Args:
-        waittime (pd.Timedelta): Time difference between closing and created date
-
-    Returns:
-        float: If the waittime is a valid time delta, then return the time in days
-        None: Returned when waittime is NaT
-    """
-    try:
-        days = abs(waittime.components[0])
-        hours = waittime.components[1] / 24
-        mins = waittime.components[2] / 60 / 24
-        secs = waittime.components[3] / 60 / 60 / 24
-        if waittime.components[0] < 0:
-            return (days + hours + mins + secs) * -1
-        else:
-            return days + hours + mins + secs
-    except:
-        # if NaT, return None
-        pass
-
-
-def map_resolution_to_bucket(description: str) -> str:
-    """
-    Maps NYPD resolution descriptions to one of 8 OLAP buckets.
-    """
-
-    d = description.lower()
-
+# Low-cardinality columns, read as categoricals and normalized before loading the OLAP
+CAT_COLS = [
+    "agency_code",
+    "agency_name",
+    "complaint_type",
+    "complaint_descriptor",
+    "location_type",
+    "board_id",
+    "borough_name",
+    "channel",
+    "park_facility_name",
+    "park_borough",
+    "city",
+]
+
+
+# Resolution buckets in order of precedence, each with the keywords that identify it
+RESOLUTION_BUCKETS = [
     # 1. ENFORCEMENT ACTION
-    if any(
-        kw in d
-        for kw in [
+    (
+        "ENFORCEMENT_ACTION",
+        [
             "issued a summons",
             "summons was issued",
             "police issued a summons",
             "made an arrest",
             "police made an arrest",
-        ]
-    ):
-        return "ENFORCEMENT_ACTION"
-
+        ],
+    ),
     # 2. REFERRED TO OTHER AGENCY
-    if any(
-        kw in d
-        for kw in [
+    (
+        "REFERRED_TO_OTHER_AGENCY",
+        [
             "referred to the department of homeless services",
             "referred to dhs",
             "does not fall under the police department's jurisdiction",
             "does not fall under the jurisdiction",
             "not under the jurisdiction",
-        ]
-    ):
-        return "REFERRED_TO_OTHER_AGENCY"
-
+        ],
+    ),
     # 3. UNABLE TO COMPLETE INVESTIGATION
-    if any(
-        kw in d
-        for kw in [
+    (
+        "UNABLE_TO_COMPLETE_INVESTIGATION",
+        [
             "unable to gain entry",
             "insufficient contact information",
             "cannot be processed at this time",
             "can not be processed at this time",
-        ]
-    ):
-        return "UNABLE_TO_COMPLETE_INVESTIGATION"
-
+        ],
+    ),
     # 4. PENDING / INCOMPLETE
-    if any(
-        kw in d
-        for kw in [
+    (
+        "PENDING_INCOMPLETE",
+        [
             "has been received and assigned",
             "additional information will be available later",
             "complaint has been received",
-        ]
-    ):
-        return "PENDING_INCOMPLETE"
-
+        ],
+    ),
     # 5. ADMINISTRATIVE / INFORMATIONAL
-    if any(
-        kw in d
-        for kw in [
+    (
+        "ADMINISTRATIVE_INFORMATIONAL",
+        [
             "a report was prepared",
             "police department reviewed your complaint",
             "provided additional information",
-        ]
-    ):
-        return "ADMINISTRATIVE_INFORMATIONAL"
-
+        ],
+    ),
     # 6. CONDITION RESOLVED WITHOUT ENFORCEMENT
-    if any(
-        kw in d
-        for kw in [
+    (
+        "CONDITION_RESOLVED_NO_ENFORCEMENT",
+        [
             "condition was corrected",
             "took action to fix the condition",
             "those responsible for the condition were gone",
             "requested a tow truck",
             "another specific tow is required",
-        ]
-    ):
-        return "CONDITION_RESOLVED_NO_ENFORCEMENT"
-
+        ],
+    ),
     # 7. POLICE RESPONSE — NO ACTION NECESSARY
-    if any(
-        kw in d
-        for kw in ["police action was not necessary", "tow request was not necessary"]
-    ):
-        return "POLICE_RESPONSE_NO_ACTION"
-
+    (
+        "POLICE_RESPONSE_NO_ACTION",
+        ["police action was not necessary", "tow request was not necessary"],
+    ),
     # 8. NO VIOLATION FOUND
-    if any(
-        kw in d
-        for kw in [
+    (
+        "NO_VIOLATION_FOUND",
+        [
             "observed no criminal violation",
             "no evidence of a criminal violation",
             "no evidence of the violation",
             "observed no encampment",
             "no encampment was found",
-        ]
-    ):
-        return "NO_VIOLATION_FOUND"
+        ],
+    ),
+]
 
-    # Fallback
-    return "NO_VIOLATION_FOUND"
+
+# One named group per bucket, wrapped in a lookahead so overlapping keywords are all found
+RESOLUTION_PATTERN = (
+    "(?="
+    + "|".join(
+        f"(?P<{bucket}>{'|'.join(map(re.escape, keywords))})"
+        for bucket, keywords in RESOLUTION_BUCKETS
+    )
+    + ")"
+)
+
+
+def map_resolution_to_bucket(descriptions: pd.Series) -> np.ndarray:
+    """
+    Maps NYPD resolution descriptions to one of 8 OLAP buckets.
+    Unmatched descriptions fall back to NO_VIOLATION_FOUND.
+    """
+
+    d = descriptions.str.lower()
+
+    # Single regex pass over the column, yielding every keyword occurrence per row
+    matches = d.str.extractall(RESOLUTION_PATTERN)
+    bucket_idx = pd.Series(
+        matches.notna().to_numpy().argmax(axis=1),
+        index=matches.index.get_level_values(0),
+    )
+    # The highest precedence bucket found in a description wins
+    first = bucket_idx.groupby(level=0).min()
+
+    buckets = np.array([bucket for bucket, _ in RESOLUTION_BUCKETS])
+    resolution = pd.Series("NO_VIOLATION_FOUND", index=descriptions.index)
+    resolution.loc[first.index] = buckets[first.to_numpy()]
+
+    return resolution.to_numpy()
+
+
+def time_components(timestamps: pd.Series) -> pd.DataFrame:
+    """
+    Splits timestamps into year, month, day, hour and weekday columns
+    using datetime64 unit casts on the underlying array. NaT gives NaN.
+    """
+
+    values = timestamps.to_numpy(dtype="datetime64[ns]")
+    years = values.astype("datetime64[Y]")
+    months = values.astype("datetime64[M]")
+    days = values.astype("datetime64[D]")
+    # NaT floor-divides to NaN with a RuntimeWarning; those rows are masked below
+    with np.errstate(invalid="ignore"):
+        hours = (values - days) // np.timedelta64(1, "h")
+
+    components = pd.DataFrame(
+        {
+            "year": years.astype(np.int64) + 1970,
+            "month": (months - years).astype(np.int64) + 1,
+            "day": (days - months).astype(np.int64) + 1,
+            "hour": hours,
+            # 1970-01-01 was a Thursday (Monday == 0)
+            "weekday": (days.astype(np.int64) + 3) % 7,
+        },
+        index=timestamps.index,
+    )
+
+    nat = np.isnat(values)
+    if nat.any():
+        components = components.astype(float)
+        components.loc[nat] = np.nan
+
+    return components
 
 
 class Printer:
@@ -215,20 +254,27 @@ if __name__ == "__main__":
     """
 
     printer("Obtaining the OLTP data...")
-    df = pd.read_sql_query(query, conn)
+    # Timestamps are parsed once here and reused by every later step
+    df = pd.read_sql_query(
+        query,
+        conn,
+        parse_dates=[
+            "created_timestamp",
+            "closed_timestamp",
+            "resolution_action_updated_timestamp",
+        ],
+        dtype={col: "category" for col in CAT_COLS},
+    )
     printer.ping()
     print()
     print(df.head())
     print()
 
-    printer("Converting timestamps to DateTime objects...")
-    df["created_timestamp"] = pd.to_datetime(df["created_timestamp"])
-    df["closed_timestamp"] = pd.to_datetime(df["closed_timestamp"])
-    printer.ping()
-
     printer("Creating waittime feature...")
-    df["waittime"] = df["closed_timestamp"] - df["created_timestamp"]
-    df["waittime"] = df["waittime"].map(conv_to_days)
+    # Wait time in (fractional) days, NaT becomes NaN
+    df["waittime"] = (
+        df["closed_timestamp"] - df["created_timestamp"]
+    ) / np.timedelta64(1, "D")
     printer.ping()
 
     printer("Filtering negative waittime rows...")
@@ -245,81 +291,61 @@ if __name__ == "__main__":
     print()
     print("=" * 22, "NAN Counts", "=" * 22)
     na_counts = df.isna().sum()
-    print(f"{'Column':<35} {'NA Counts':<12} {'NA %':<5}")
-    for col in na_counts.index:  # type:ignore
-        if na_counts[col] == 0:  # type:ignore
-            continue
-        print(
-            f"{col:<35} {na_counts[col]:<12} {na_counts[col]/df.shape[0]:.2%}"  # type:ignore
-        )  # type:ignore
+    na_counts = na_counts[na_counts > 0]
+    na_report = pd.DataFrame(
+        {
+            "NA Counts": na_counts,
+            "NA %": (na_counts / df.shape[0]).map("{:.2%}".format),
+        }
+    )
+    print(na_report.rename_axis("Column").to_string())
 
     print()
 
     print("Normalizing categorical columns...\n")
-    CAT_COLS = [
-        "agency_code",
-        "agency_name",
-        "complaint_type",
-        "complaint_descriptor",
-        "location_type",
-        "board_id",
-        "borough_name",
-        "channel",
-        "park_facility_name",
-        "park_borough",
-        "city",
-    ]
-
     for i, col in enumerate(CAT_COLS):
         printer(f"Processing {col}... ({i+1}/{len(CAT_COLS)})")
-        val_cts = df[col].value_counts()
-        unique, counts = val_cts.index, val_cts.values
-
-        for i in range(len(unique)):
-            key, count = unique[i], counts[i]
-            new_key = (
-                key.upper() if count > 100 or key.upper() == "UNSPECIFIED" else "OTHER"
-            )
-            df.loc[df[col] == key, col] = new_key
+        cat = df[col].astype("category").cat
+        # An all-null column has no categories to relabel
+        if len(cat.categories):
+            counts = df[col].value_counts().reindex(cat.categories, fill_value=0)
+            upper = cat.categories.str.upper()
+
+            # Frequent (or UNSPECIFIED) categories are upper-cased, the rest become
+            # OTHER. Only the categories are relabelled; row codes are remapped in
+            # one take.
+            keep = (counts.to_numpy() > 100) | (upper == "UNSPECIFIED")
+            code_map, new_categories = pd.factorize(np.where(keep, upper, "OTHER"))
+            codes = np.where(cat.codes >= 0, code_map[cat.codes], -1)  # NaN stays NaN
+            df[col] = pd.Categorical.from_codes(codes, categories=new_categories)
 
         printer.ping()
     print()
 
     for col in CAT_COLS:
         val_cts = df[col].value_counts()
+        val_cts = val_cts[val_cts > 0]  # categoricals also list unused categories
         unique, counts = val_cts.index, val_cts.values
         if len(unique) > 10:
             continue
 
+        total = counts.sum()
         print(f"Column: {col}")
         print(f"{'Value':<35} {'Count':<7} {'Percentage %':<15}")
         for i in range(len(unique)):
-            key, count = unique[i], counts[i]
-            print(
-                f"{unique[i]:<35} {counts[i]:<7} {counts[i]/(np.sum(list(counts)).item()):.2%}"
-            )
+            print(f"{unique[i]:<35} {counts[i]:<7} {counts[i]/total:.2%}")
 
         print()
         print("=" * 70)
 
     printer("Creating columns for time components of creation time...")
-    df["created_timestamp"] = pd.to_datetime(df["created_timestamp"])
-
-    df["created_year"] = df["created_timestamp"].dt.year  # type:ignore
-    df["created_month"] = df["created_timestamp"].dt.month  # type:ignore
-    df["created_day"] = df["created_timestamp"].dt.day  # type:ignore
-    df["created_hour"] = df["created_timestamp"].dt.hour  # type:ignore
-    df["created_weekday"] = df["created_timestamp"].dt.weekday  # type:ignore
+    components = time_components(df["created_timestamp"])
+    df[components.columns.map("created_{}".format)] = components
     printer.ping()
 
     printer("Creating columns for time components of closure time...")
-    df["closed_timestamp"] = pd.to_datetime(df["closed_timestamp"])
-
-    df["closed_year"] = df["closed_timestamp"].dt.year  # type:ignore
-    df["closed_month"] = df["closed_timestamp"].dt.month  # type:ignore
-    df["closed_day"] = df["closed_timestamp"].dt.day  # type:ignore
-    df["closed_hour"] = df["closed_timestamp"].dt.hour  # type:ignore
-    df["closed_weekday"] = df["closed_timestamp"].dt.weekday  # type:ignore
+    components = time_components(df["closed_timestamp"])
+    df[components.columns.map("closed_{}".format)] = components
     printer.ping()
     print()
     print(df.head())
@@ -330,17 +356,19 @@ if __name__ == "__main__":
     printer.ping()
 
     printer("Creating resolution_type for categorizing resolution_description")
-    df["resolution_type"] = df["resolution_description"].apply(map_resolution_to_bucket)
+    df["resolution_type"] = map_resolution_to_bucket(df["resolution_description"])
     printer.ping()
 
     printer("Saving processed dataset...")
-    df_clean = df.copy()
     base_dir = os.path.abspath(os.getcwd())
     data_dir = os.path.abspath(os.path.join(base_dir, "Data"))
 
     os.makedirs(data_dir, exist_ok=True)
 
-    output_path = os.path.join(data_dir, "requests_cleaned.csv")
-    df_clean.to_csv(output_path, index=False)
+    output_path = os.path.join(data_dir, "requests_cleaned.parquet")
+    # Write to a temporary file first so a failed write never leaves a partial output
+    tmp_path = output_path + ".tmp"
+    df.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+    os.replace(tmp_path, output_path)
     printer.ping()
     print("Saved to:", output_path)
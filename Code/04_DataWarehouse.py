@@ -1,7 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
+import numpy as np
 import pandas as pd
 import os
+import shutil
 import sqlite3 as sq3
+import subprocess
+import tempfile
 
 OLAP_SCHEMA_TABLES = [
     "dim_agency",
@@ -13,6 +18,82 @@ OLAP_SCHEMA_TABLES = [
     "fact_service_request",
 ]
 
+# Columns of requests_cleaned.parquet the dimension and fact loaders read
+WAREHOUSE_COLS = [
+    "request_id",
+    "created_timestamp",
+    "waittime",
+    "agency_code",
+    "agency_name",
+    "complaint_type",
+    "complaint_descriptor",
+    "channel",
+    "resolution_type",
+    "location_type",
+    "board_id",
+    "borough_name",
+    "zip",
+    "city",
+]
+
+# Each fact key, in fact table column order: its dimension table, the source
+# columns identifying a dimension row, their names in that table, and those
+# the table declares NOT NULL
+DIMENSIONS = {
+    "date_key": ("dim_date", ["date"], ["date"], ["date"]),
+    "agency_key": ("dim_agency", ["agency_code"], ["agency_code"], ["agency_code"]),
+    "complaint_key": (
+        "dim_complaint",
+        ["complaint_type", "complaint_descriptor"],
+        ["complaint_type", "descriptor"],
+        ["complaint_type"],
+    ),
+    "location_key": (
+        "dim_location",
+        ["location_type", "board_id", "borough_name", "zip", "city"],
+        ["location_type", "board_id", "borough", "zip", "city"],
+        ["location_type"],
+    ),
+    "channel_key": ("dim_channel", ["channel"], ["channel_name"], ["channel"]),
+    "resolution_key": (
+        "dim_resolution",
+        ["resolution_type"],
+        ["resolution_type"],
+        ["resolution_type"],
+    ),
+}
+
+# Wait time summaries read by the OLAP reports: table -> (dimension, key, group-by)
+SUMMARY_TABLES = {
+    "agg_channel": ("dim_channel", "channel_key", ["channel_name"]),
+    "agg_location_type": ("dim_location", "location_key", ["location_type"]),
+    "agg_borough": ("dim_location", "location_key", ["borough"]),
+    "agg_city": ("dim_location", "location_key", ["city"]),
+    "agg_weekday": ("dim_date", "date_key", ["weekday", "is_weekend"]),
+    "agg_month": ("dim_date", "date_key", ["month"]),
+    "agg_complaint": ("dim_complaint", "complaint_key", ["complaint_type"]),
+}
+
+# Fact loads larger than this go through the sqlite3 CLI's CSV import when available.
+# The default ~600k-row collection is above it.
+FACT_BULK_THRESHOLD = 100_000
+
+
+def tune(conn: sq3.Connection):
+    """Connection settings for fast bulk writes: WAL journal, no fsync per commit,
+    in-memory temp storage and a larger page cache / mmap window.
+    """
+    conn.executescript(
+        """
+        PRAGMA journal_mode = WAL;
+        PRAGMA synchronous = NORMAL;
+        PRAGMA temp_store = MEMORY;
+        PRAGMA cache_size = -262144;
+        PRAGMA mmap_size = 268435456;
+        PRAGMA foreign_keys = ON;
+        """
+    )
+
 
 def create_schema(conn: sq3.Connection):
     cur = conn.cursor()
@@ -90,29 +171,35 @@ def create_schema(conn: sq3.Connection):
         FOREIGN KEY (channel_key) REFERENCES dim_channel(channel_key),
         FOREIGN KEY (resolution_key) REFERENCES dim_resolution(resolution_key)
     );
+
+    -- =========================
+    -- Covering indexes for the OLAP group-bys
+    -- =========================
+
+    CREATE INDEX IF NOT EXISTS idx_fact_date
+        ON fact_service_request(date_key, wait_time_hours);
+    CREATE INDEX IF NOT EXISTS idx_fact_channel
+        ON fact_service_request(channel_key, wait_time_hours);
+    CREATE INDEX IF NOT EXISTS idx_fact_location
+        ON fact_service_request(location_key, wait_time_hours);
+    CREATE INDEX IF NOT EXISTS idx_fact_complaint
+        ON fact_service_request(complaint_key, wait_time_hours);
     """
     cur.executescript(olap_schema)
     conn.commit()
 
 
-def check_table(conn: sq3.Connection, table_name: str):
-    cur = conn.cursor()
-    cur.execute(
-        f"""
-    SELECT name
-    FROM sqlite_master
-    WHERE type='table' AND name='{table_name}';
-    """
-    )
-
-    exists = cur.fetchone() is not None
-    return exists
+def existing_tables(conn: sq3.Connection) -> set[str]:
+    cur = conn.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    return {row[0] for row in cur.fetchall()}
 
 
 def check_schema(conn: sq3.Connection):
+    existing = existing_tables(conn)
+
     flag = True
     for table in OLAP_SCHEMA_TABLES:
-        exists = check_table(conn, table)
+        exists = table in existing
         print(f"{table} {'exists.' if exists else 'does not exist.'}")
         if not exists:
             print(
@@ -127,18 +214,66 @@ def check_schema(conn: sq3.Connection):
 
 
 def clear_tables(conn: sq3.Connection):
-    cur = conn.cursor()
-    cur.execute("PRAGMA foreign_keys = OFF;")
+    # FK pragma is ignored inside a transaction, so toggle it around the DELETEs
+    conn.execute("PRAGMA foreign_keys = OFF;")
+    with conn:
+        for table in OLAP_SCHEMA_TABLES:
+            conn.execute(f"DELETE FROM {table};")
+        for table in SUMMARY_TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table};")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    print("\x1b[32mAll tables cleared.\x1b[0m")
 
-    for table in OLAP_SCHEMA_TABLES:
-        cur.execute(f"DELETE FROM {table};")
 
-    cur.execute("PRAGMA foreign_keys = ON;")
-    conn.commit()
-    print("\x1b[32mAll tables cleared.\x1b[0m")
+def insert_or_ignore(table, conn, keys: list[str], data_iter) -> int:
+    """
+    DataFrame.to_sql insertion method that binds all rows to one
+    INSERT OR IGNORE statement. The row tuples are streamed to executemany
+    without an intermediate list.
+    """
+    columns = ", ".join(keys)
+    params = ", ".join("?" * len(keys))
+    conn.executemany(
+        f"INSERT OR IGNORE INTO {table.name} ({columns}) VALUES ({params});",
+        data_iter,
+    )
+    return conn.rowcount
 
 
-def add_agency(conn: sq3.Connection, df: pd.DataFrame) -> None:
+def resolve_keys(
+    conn: sq3.Connection, df: pd.DataFrame, key: str
+) -> tuple[pd.Series, pd.DataFrame]:
+    """
+    Keys every row of `df` by its dimension row. The distinct rows are
+    factorized in one hash pass and compared by value with the stored ones:
+    stored rows keep their key and new rows are numbered after the largest.
+    Returns each row's key and the new rows to insert, indexed by their key.
+    Rows missing a NOT NULL attribute get no dimension row and a NULL key.
+    """
+    table, columns, stored_columns, required = DIMENSIONS[key]
+    codes, uniques = pd.MultiIndex.from_frame(df[columns]).factorize()
+    rows = uniques.to_frame(index=False, name=columns).astype(object)
+
+    # Plain values on both sides, so no stored value is lost to a dtype cast
+    stored = pd.read_sql_query(
+        f"SELECT {key}, {', '.join(stored_columns)} FROM {table};", conn
+    )
+    stored = stored.set_axis([key, *columns], axis=1).astype(
+        {col: object for col in columns}
+    )
+    stored = stored.drop_duplicates(subset=columns, keep="last")
+    rows = rows.merge(stored, on=columns, how="left")
+
+    new = rows[key].isna() & rows[required].notna().all(axis=1)
+    next_key = conn.execute(f"SELECT COALESCE(MAX({key}), -1) + 1 FROM {table};")
+    start = next_key.fetchone()[0]
+    rows.loc[new, key] = np.arange(start, start + new.sum())
+
+    keys = pd.Series(rows[key].to_numpy()[codes], index=df.index).astype("Int64")
+    return keys, rows[new].astype({key: "int64"}).set_index(key)
+
+
+def add_agency(conn: sq3.Connection, df: pd.DataFrame, agencies: pd.DataFrame) -> None:
     """
     dim_agency (
         agency_key INTEGER PRIMARY KEY,
@@ -146,21 +281,13 @@ def add_agency(conn: sq3.Connection, df: pd.DataFrame) -> None:
         agency_name TEXT NOT NULL
     );
     """
-    cur = conn.cursor()
-    for agency_id, agency in enumerate(df["agency_code"].unique()):
-        agency_name = df["agency_name"][df["agency_code"] == agency].iloc[0]
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO dim_agency (agency_key, agency_code, agency_name)
-            VALUES (?, ?, ?);
-            """,
-            (agency_id, agency, agency_name),
-        )
-
-    conn.commit()
+    # First non-null agency_name for each agency code, in a single hash aggregation
+    names = df.groupby("agency_code", sort=False, observed=True)["agency_name"].first()
+    agencies = agencies.assign(agency_name=agencies["agency_code"].map(names))
+    agencies.to_sql("dim_agency", conn, if_exists="append", method=insert_or_ignore)
 
 
-def add_date(conn: sq3.Connection, df: pd.DataFrame) -> None:
+def add_date(conn: sq3.Connection, df: pd.DataFrame, rows: pd.DataFrame) -> None:
     """
     dim_date (
         date_key INTEGER PRIMARY KEY,
@@ -172,31 +299,25 @@ def add_date(conn: sq3.Connection, df: pd.DataFrame) -> None:
         is_weekend INTEGER NOT NULL
     );
     """
-    cur = conn.cursor()
-
-    df["created_timestamp"] = pd.to_datetime(df["created_timestamp"])
-    unique_dates = df["created_timestamp"].dt.date.unique()  # type:ignore
-    for date_id, date in enumerate(unique_dates):
-        date_obj = pd.to_datetime(date)
-        year = date_obj.year
-        month = date_obj.month
-        day = date_obj.day
-        weekday = date_obj.weekday()
-        is_weekend = 1 if weekday >= 5 else 0
-
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO dim_date (
-                date_key, date, year, month, day, weekday, is_weekend
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?);
-            """,
-            (date_id, date.isoformat(), year, month, day, weekday, is_weekend),
-        )
-    conn.commit()
+    dates = pd.to_datetime(rows["date"])
+    weekday = dates.dt.weekday
+
+    dim = pd.DataFrame(
+        {
+            "date": dates.dt.strftime("%Y-%m-%d"),
+            "year": dates.dt.year,
+            "month": dates.dt.month,
+            "day": dates.dt.day,
+            "weekday": weekday,
+            "is_weekend": (weekday >= 5).astype("int8"),
+        }
+    )
+    dim.to_sql("dim_date", conn, if_exists="append", method=insert_or_ignore)
 
 
-def add_complaint_type(conn: sq3.Connection, df: pd.DataFrame) -> None:
+def add_complaint_type(
+    conn: sq3.Connection, df: pd.DataFrame, complaints: pd.DataFrame
+) -> None:
     """
     dim_complaint (
         complaint_key INTEGER PRIMARY KEY,
@@ -204,63 +325,40 @@ def add_complaint_type(conn: sq3.Connection, df: pd.DataFrame) -> None:
         descriptor TEXT
     );
     """
-    cur = conn.cursor()
-    complaint_types = df[["complaint_type", "complaint_descriptor"]].drop_duplicates()
-    complaint_id = 0
-    for _, row in complaint_types.iterrows():
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO dim_complaint (complaint_key, complaint_type, descriptor)
-            VALUES (?, ?, ?);
-            """,
-            (complaint_id, row["complaint_type"], row["complaint_descriptor"]),
-        )
-        complaint_id += 1
-
-    conn.commit()
+    complaints.rename(columns={"complaint_descriptor": "descriptor"}).to_sql(
+        "dim_complaint", conn, if_exists="append", method=insert_or_ignore
+    )
 
 
-def add_channel(conn: sq3.Connection, df: pd.DataFrame) -> None:
+def add_channel(conn: sq3.Connection, df: pd.DataFrame, channels: pd.DataFrame) -> None:
     """
     dim_channel (
         channel_key INTEGER PRIMARY KEY,
         channel_name TEXT NOT NULL
     );
     """
-    cur = conn.cursor()
-    for channel_id, channel in enumerate(df["channel"].unique()):
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO dim_channel (channel_key, channel_name)
-            VALUES (?, ?);
-            """,
-            (channel_id, channel),
-        )
-
-    conn.commit()
+    channels.rename(columns={"channel": "channel_name"}).to_sql(
+        "dim_channel", conn, if_exists="append", method=insert_or_ignore
+    )
 
 
-def add_resolution(conn: sq3.Connection, df: pd.DataFrame) -> None:
+def add_resolution(
+    conn: sq3.Connection, df: pd.DataFrame, resolutions: pd.DataFrame
+) -> None:
     """
     dim_resolution (
         resolution_key INTEGER PRIMARY KEY,
         resolution_type TEXT NOT NULL
     );
     """
-    cur = conn.cursor()
-    for resolution_id, resolution_type in enumerate(df["resolution_type"].unique()):
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO dim_resolution (resolution_key, resolution_type)
-            VALUES (?, ?);
-            """,
-            (resolution_id, resolution_type),
-        )
-
-    conn.commit()
+    resolutions.to_sql(
+        "dim_resolution", conn, if_exists="append", method=insert_or_ignore
+    )
 
 
-def add_location(conn: sq3.Connection, df: pd.DataFrame) -> None:
+def add_location(
+    conn: sq3.Connection, df: pd.DataFrame, locations: pd.DataFrame
+) -> None:
     """
     dim_location (
         location_key INTEGER PRIMARY KEY,
@@ -271,40 +369,14 @@ def add_location(conn: sq3.Connection, df: pd.DataFrame) -> None:
         city TEXT
     );
     """
-    cur = conn.cursor()
-    locations = df[
-        [
-            "location_type",
-            "board_id",
-            "borough_name",
-            "zip",
-            "city",
-        ]
-    ]
-    locations = locations.drop_duplicates()
-    location_id = 0
-    for _, row in locations.iterrows():
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO dim_location (
-                location_key, location_type, board_id, borough, zip, city
-            )
-            VALUES (?, ?, ?, ?, ?, ?);
-            """,
-            (
-                location_id,
-                row["location_type"],
-                row["board_id"],
-                row["borough_name"],
-                row["zip"],
-                row["city"],
-            ),
-        )
-        location_id += 1
-    conn.commit()
+    locations.rename(columns={"borough_name": "borough"}).to_sql(
+        "dim_location", conn, if_exists="append", method=insert_or_ignore
+    )
 
 
-def add_service_request(conn: sq3.Connection, df: pd.DataFrame) -> None:
+def add_service_request(
+    conn: sq3.Connection, df: pd.DataFrame, keys: dict[str, pd.Series]
+) -> None:
     """
     fact_service_request (
         fact_id INTEGER PRIMARY KEY,
@@ -327,110 +399,150 @@ def add_service_request(conn: sq3.Connection, df: pd.DataFrame) -> None:
         FOREIGN KEY (resolution_key) REFERENCES dim_resolution(resolution_key)
     );
     """
-    cur = conn.cursor()
+    facts = pd.DataFrame(keys).rename_axis("fact_id")
+    facts["wait_time_hours"] = df["waittime"] * 24
+    facts["wait_time_days"] = df["waittime"]
 
-    agency_map = {}
-    cur.execute("SELECT agency_key, agency_code FROM dim_agency;")
-    rows = cur.fetchall()
-    for row in rows:
-        agency_map[row[1]] = row[0]
-
-    complaint_map = {}
-    cur.execute("SELECT complaint_key, complaint_type FROM dim_complaint;")
-    rows = cur.fetchall()
-    for row in rows:
-        complaint_map[row[1]] = row[0]
-
-    date_map = {}
-    cur.execute("SELECT date_key, date FROM dim_date;")
-    rows = cur.fetchall()
-    for row in rows:
-        date_map[row[1]] = row[0]
-
-    location_map = {}
-    cur.execute(
-        "SELECT location_key, location_type, board_id, borough, zip, city FROM dim_location;"
-    )
-    rows = cur.fetchall()
-    for row in rows:
-        key = (row[1], row[2], row[3], row[4], row[5])
-        location_map[key] = row[0]
-
-    channel_map = {}
-    cur.execute("SELECT channel_key, channel_name FROM dim_channel;")
-    rows = cur.fetchall()
-    for row in rows:
-        channel_map[row[1]] = row[0]
-
-    resolution_map = {}
-    cur.execute("SELECT resolution_key, resolution_type FROM dim_resolution;")
-    rows = cur.fetchall()
-    for row in rows:
-        resolution_map[row[1]] = row[0]
-
-    for fact_id, row in df.iterrows():
-        created_date = pd.to_datetime(row["created_timestamp"]).date().isoformat()
-        date_key = date_map[created_date]
-        agency_key = agency_map[row["agency_code"]]
-        complaint_key = complaint_map.get(row["complaint_type"], None)
-        location_key = location_map.get(
-            (
-                row["location_type"],
-                row["board_id"],
-                row["borough_name"],
-                str(row["zip"]),
-                row["city"],
-            ),
-            None,
+    if len(facts) > FACT_BULK_THRESHOLD and shutil.which("sqlite3"):
+        bulk_load_facts(conn, facts)
+    else:
+        facts.to_sql("fact_service_request", conn, if_exists="append", chunksize=50000)
+
+
+def build_summaries(conn: sq3.Connection) -> None:
+    """
+    Rebuilds the agg_* tables with the count, sum and sum of squares of the
+    wait times per report group, so each OLAP report reads a handful of rows
+    instead of scanning the fact table. The CASTs give the aggregate columns
+    a declared type, which CREATE TABLE ... AS otherwise leaves empty.
+    """
+    for table, (dimension, key, group_by) in SUMMARY_TABLES.items():
+        columns = ", ".join(group_by)
+        conn.execute(f"DROP TABLE IF EXISTS {table};")
+        conn.execute(
+            f"""
+        CREATE TABLE {table} AS
+        SELECT
+        {columns},
+        CAST(COUNT(*) AS INTEGER) AS count,
+        CAST(SUM(wait_time_hours) AS REAL) AS sum_hours,
+        CAST(SUM(wait_time_hours * wait_time_hours) AS REAL) AS sum_sq_hours
+        FROM fact_service_request f
+        JOIN {dimension} d
+        ON f.{key} = d.{key}
+        GROUP BY {columns};
+        """
         )
-        channel_key = channel_map[row["channel"]]
-        resolution_key = resolution_map[row["resolution_type"]]
+    conn.commit()
 
-        wait_time_hours = row["waittime"] * 24
-        wait_time_days = row["waittime"]
 
-        cur.execute(
-            """
-            INSERT INTO fact_service_request (
-                fact_id, date_key, agency_key, complaint_key, location_key,
-                channel_key, resolution_key, wait_time_hours, wait_time_days
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
-            """,
-            (
-                fact_id,
-                date_key,
-                agency_key,
-                complaint_key,
-                location_key,
-                channel_key,
-                resolution_key,
-                wait_time_hours,
-                wait_time_days,
-            ),
+def bulk_load_facts(conn: sq3.Connection, facts: pd.DataFrame) -> None:
+    """
+    Loads the prepared fact frame with the sqlite3 CLI's `.import`, which
+    parses the CSV in C instead of binding each row from Python.
+    Empty CSV fields of the nullable keys are turned back into NULLs.
+    """
+    db_path = conn.execute("PRAGMA database_list;").fetchone()[2]
+    key_cols = [col for col in facts.columns if col.endswith("_key")]
+    facts = facts.astype({col: "Int64" for col in key_cols})
+
+    fd, csv_path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        facts.to_csv(csv_path)
+        # The CLI starts with foreign keys off, and the pragma is ignored once inside
+        # the transaction; that one transaction lets -bail roll back staging too
+        script = f"""
+        PRAGMA foreign_keys = ON;
+        BEGIN;
+        DROP TABLE IF EXISTS fact_staging;
+        .import --csv "{csv_path}" fact_staging
+        INSERT INTO fact_service_request (
+            fact_id, date_key, agency_key, complaint_key, location_key,
+            channel_key, resolution_key, wait_time_hours, wait_time_days
         )
+        SELECT
+            fact_id, date_key, agency_key,
+            NULLIF(complaint_key, ''), NULLIF(location_key, ''),
+            NULLIF(channel_key, ''), NULLIF(resolution_key, ''),
+            wait_time_hours, wait_time_days
+        FROM fact_staging;
+        DROP TABLE fact_staging;
+        COMMIT;
+        """
+        subprocess.run(
+            ["sqlite3", "-bail", db_path],
+            input="\n".join(line.strip() for line in script.splitlines()),
+            text=True,
+            check=True,
+        )
+    finally:
+        os.remove(csv_path)
 
-    conn.commit()
+
+# Loader for each dimension table; none of them reads another dimension
+DIMENSION_LOADERS = {
+    "dim_agency": add_agency,
+    "dim_complaint": add_complaint_type,
+    "dim_date": add_date,
+    "dim_channel": add_channel,
+    "dim_resolution": add_resolution,
+    "dim_location": add_location,
+}
+
+
+def load_dimension(
+    db_path: str, table: str, df: pd.DataFrame, rows: pd.DataFrame
+) -> None:
+    """
+    Runs one dimension loader on its own connection, since sqlite3 connections
+    cannot be shared across threads. SQLite still takes one writer at a time,
+    so the timeout lets a loader wait out another's commit.
+    """
+    conn = sq3.connect(db_path, timeout=60)
+    try:
+        tune(conn)
+        DIMENSION_LOADERS[table](conn, df, rows)
+    finally:
+        conn.close()
 
 
 def add_contents(conn: sq3.Connection, df: pd.DataFrame):
-    for table in OLAP_SCHEMA_TABLES:
-        print(f"Adding contents to {table}...")
-        match table:
-            case "dim_agency":
-                add_agency(conn, df)
-            case "dim_date":
-                add_date(conn, df)
-            case "dim_complaint":
-                add_complaint_type(conn, df)
-            case "dim_channel":
-                add_channel(conn, df)
-            case "dim_resolution":
-                add_resolution(conn, df)
-            case "dim_location":
-                add_location(conn, df)
-            case "fact_service_request":
-                add_service_request(conn, df)
+    # zip is the only location key column not already categorical, so cast it
+    # once for the location factorization to work on codes
+    df = df.astype({"zip": "category"})
+    # Dates are matched against dim_date's text, so only the distinct days are formatted
+    dates = pd.to_datetime(df["created_timestamp"]).dt.normalize().astype("category")
+    df["date"] = dates.cat.rename_categories(
+        dates.cat.categories.strftime("%Y-%m-%d")
+    )
+
+    # Resolve every key before loading, so the facts and the new dimension rows agree
+    resolved = {key: resolve_keys(conn, df, key) for key in DIMENSIONS}
+
+    # Overlap the pandas work of one dimension with the inserts of another
+    db_path = conn.execute("PRAGMA database_list;").fetchone()[2]
+    tables = [table for table, *_ in DIMENSIONS.values()]
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(load_dimension, db_path, table, df, rows)
+            for table, (_, rows) in zip(tables, resolved.values())
+        ]
+        # Report from the main thread so the worker output never interleaves
+        for table, future in zip(tables, futures):
+            future.result()
+            print(f"Added contents to {table}.")
+
+    # The facts reference every dimension by foreign key, so they load last
+    print("Adding contents to fact_service_request...")
+    add_service_request(conn, df, {key: keys for key, (keys, _) in resolved.items()})
+
+    print("Building OLAP summary tables...")
+    build_summaries(conn)
+
+    # Refresh planner statistics so the OLAP queries pick the covering indexes
+    conn.execute("ANALYZE;")
+    conn.commit()
 
     print("\x1b[32mSUCCESS: All contents added to database.\x1b[0m")
 
@@ -440,6 +552,7 @@ if __name__ == "__main__":
     db_dir = os.path.join(base_dir, "Data")
     db_path = os.path.join(db_dir, "olap_311.db")
     conn = sq3.connect(db_path)
+    tune(conn)
 
     print("Connection to olap_311.db established.")
 
@@ -466,8 +579,9 @@ if __name__ == "__main__":
         quit(0)
 
     print("Reading the data...")
-    data_path = os.path.join(db_dir, "requests_cleaned.csv")
-    df = pd.read_csv(data_path, index_col="request_id")
+    data_path = os.path.join(db_dir, "requests_cleaned.parquet")
+    df = pd.read_parquet(data_path, engine="pyarrow", columns=WAREHOUSE_COLS)
+    df = df.set_index("request_id")
 
     print("Adding dataframe contents to database...\n")
     add_contents(conn, df)
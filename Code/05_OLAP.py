@@ -1,140 +1,58 @@
 import sqlite3 as sq3
+import numpy as np
 import pandas as pd
 import os
 
 
-def channel_olap(conn: sq3.Connection):
-    query = """
+def wait_time_olap(conn: sq3.Connection, table: str, group_by: list[str]):
+    """Wait time count, standard deviation and mean (hours) for each group,
+    derived from the sums in one of the agg_* tables 04 builds after a load.
+    """
+    columns = ", ".join(group_by)
+    query = f"""
         SELECT
-        COUNT(*) AS count,
-        sqrt(
-            AVG(wait_time_hours * wait_time_hours)
-            - AVG(wait_time_hours) * AVG(wait_time_hours)
-        ) AS stdev_waittime_hours,
-        AVG(wait_time_hours) AS mean_waittime_hours,
-        channel_name
-        FROM fact_service_request f
-        JOIN dim_channel c
-        ON f.channel_key = c.channel_key
-        GROUP BY channel_name
+        count,
+        sum_hours,
+        sum_sq_hours,
+        {columns}
+        FROM {table}
+        ORDER BY {columns}
     """
     df = pd.read_sql_query(query, conn)
-    return df
+
+    mean = df["sum_hours"] / df["count"]
+    variance = (df["sum_sq_hours"] - df["sum_hours"] * mean) / df["count"]
+    df["stdev_waittime_hours"] = np.sqrt(variance.clip(lower=0))
+    df["mean_waittime_hours"] = mean
+    return df[["count", "stdev_waittime_hours", "mean_waittime_hours", *group_by]]
+
+
+def channel_olap(conn: sq3.Connection):
+    return wait_time_olap(conn, "agg_channel", ["channel_name"])
 
 
 def location_type_olap(conn: sq3.Connection):
-    query = """
-        SELECT
-        COUNT(*) AS count,
-        sqrt(
-            AVG(wait_time_hours * wait_time_hours)
-            - AVG(wait_time_hours) * AVG(wait_time_hours)
-        ) AS stdev_waittime_hours,
-        AVG(wait_time_hours) AS mean_waittime_hours,
-        location_type
-        FROM fact_service_request f
-        JOIN dim_location l
-        ON f.location_key = l.location_key
-        GROUP BY location_type
-    """
-    df = pd.read_sql_query(query, conn)
-    return df
+    return wait_time_olap(conn, "agg_location_type", ["location_type"])
 
 
 def borough_olap(conn: sq3.Connection):
-    query = """
-        SELECT
-        COUNT(*) AS count,
-        sqrt(
-            AVG(wait_time_hours * wait_time_hours)
-            - AVG(wait_time_hours) * AVG(wait_time_hours)
-        ) AS stdev_waittime_hours,
-        AVG(wait_time_hours) AS mean_waittime_hours,
-        borough
-        FROM fact_service_request f
-        JOIN dim_location l
-        ON f.location_key = l.location_key
-        GROUP BY borough
-    """
-    df = pd.read_sql_query(query, conn)
-    return df
+    return wait_time_olap(conn, "agg_borough", ["borough"])
 
 
 def city_olap(conn: sq3.Connection):
-    query = """
-        SELECT
-        COUNT(*) AS count,
-        sqrt(
-            AVG(wait_time_hours * wait_time_hours)
-            - AVG(wait_time_hours) * AVG(wait_time_hours)
-        ) AS stdev_waittime_hours,
-        AVG(wait_time_hours) AS mean_waittime_hours,
-        city
-        FROM fact_service_request f
-        JOIN dim_location l
-        ON f.location_key = l.location_key
-        GROUP BY city
-    """
-    df = pd.read_sql_query(query, conn)
-    return df
+    return wait_time_olap(conn, "agg_city", ["city"])
 
 
 def weekday_olap(conn: sq3.Connection):
-    query = """
-        SELECT
-        COUNT(*) AS count,
-        sqrt(
-            AVG(wait_time_hours * wait_time_hours)
-            - AVG(wait_time_hours) * AVG(wait_time_hours)
-        ) AS stdev_waittime_hours,
-        AVG(wait_time_hours) AS mean_waittime_hours,
-        weekday,
-        is_weekend
-        FROM fact_service_request f
-        JOIN dim_date d
-        ON f.date_key = d.date_key
-        GROUP BY weekday
-    """
-    df = pd.read_sql_query(query, conn)
-    return df
+    return wait_time_olap(conn, "agg_weekday", ["weekday", "is_weekend"])
 
 
 def month_olap(conn: sq3.Connection):
-    query = """
-        SELECT
-        COUNT(*) AS count,
-        sqrt(
-            AVG(wait_time_hours * wait_time_hours)
-            - AVG(wait_time_hours) * AVG(wait_time_hours)
-        ) AS stdev_waittime_hours,
-        AVG(wait_time_hours) AS mean_waittime_hours,
-        month
-        FROM fact_service_request f
-        JOIN dim_date d
-        ON f.date_key = d.date_key
-        GROUP BY month
-    """
-    df = pd.read_sql_query(query, conn)
-    return df
+    return wait_time_olap(conn, "agg_month", ["month"])
 
 
 def complaint_olap(conn: sq3.Connection):
-    query = """
-        SELECT
-        COUNT(*) AS count,
-        sqrt(
-            AVG(wait_time_hours * wait_time_hours)
-            - AVG(wait_time_hours) * AVG(wait_time_hours)
-        ) AS stdev_waittime_hours,
-        AVG(wait_time_hours) AS mean_waittime_hours,
-        complaint_type
-        FROM fact_service_request f
-        JOIN dim_complaint c
-        ON f.complaint_key = c.complaint_key
-        GROUP BY complaint_type
-    """
-    df = pd.read_sql_query(query, conn)
-    return df
+    return wait_time_olap(conn, "agg_complaint", ["complaint_type"])
 
 
 if __name__ == "__main__":
@@ -142,6 +60,8 @@ if __name__ == "__main__":
     db_dir = os.path.join(base_dir, "Data")
     db_path = os.path.join(db_dir, "olap_311.db")
     conn = sq3.connect(db_path)
+    # Refreshes planner statistics only for tables that changed since the last ANALYZE
+    conn.execute("PRAGMA optimize;")
 
     sep_len = 28
     print()